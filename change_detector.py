@@ -4,6 +4,7 @@ from difflib import SequenceMatcher
 from typing import Dict, List, Any
 from screenshot_manager import ScreenshotManager
 from change_scorer import ChangeScorer
+from content_chunks import chunk_hashes
 
 class ChangeDetector:
     def __init__(self):
@@ -25,6 +26,10 @@ class ChangeDetector:
         if 'content_hash' not in current_content:
             current_content['content_hash'] = self._generate_content_hash(current_content)
 
+        # Paragraph hashes let unchanged text be skipped without a full compare
+        if 'content_chunks' not in current_content:
+            current_content['content_chunks'] = chunk_hashes(current_content.get('text_content', ''))
+
         # Handle first run case
         if not self.previous_content:
             self.previous_content = current_content
@@ -38,6 +43,8 @@ class ChangeDetector:
         # Map text to text_content in previous content if needed
         if 'text' in self.previous_content and 'text_content' not in self.previous_content:
             self.previous_content['text_content'] = self.previous_content['text']
+        if 'content_chunks' not in self.previous_content:
+            self.previous_content['content_chunks'] = chunk_hashes(self.previous_content.get('text_content', ''))
 
         changes = []
 
@@ -53,7 +60,9 @@ class ChangeDetector:
         text_changes = self._compare_text(
             self.previous_content.get('text_content', ''),
             current_content.get('text_content', ''),
-            current_content['timestamp']
+            current_content['timestamp'],
+            self.previous_content['content_chunks'],
+            current_content['content_chunks']
         )
         changes.extend(text_changes)
 
@@ -79,16 +88,29 @@ class ChangeDetector:
         content_str += str(content.get('pages', []))
         return hashlib.md5(content_str.encode()).hexdigest()
 
-    def _compare_text(self, old_text: str, new_text: str, timestamp: str) -> List[Dict[str, Any]]:
+    def _compare_text(self, old_text: str, new_text: str, timestamp: str,
+                      old_chunks: List[str] = None, new_chunks: List[str] = None) -> List[Dict[str, Any]]:
         """Compares text content and returns changes"""
         changes = []
 
-        if old_text != new_text:
+        # Unchanged text needs no hashing at all
+        if old_text == new_text:
+            return changes
+
+        if old_chunks is None:
+            old_chunks = chunk_hashes(old_text)
+        if new_chunks is None:
+            new_chunks = chunk_hashes(new_text)
+
+        if old_chunks != new_chunks:
+            # Paragraphs present on only one side
+            changed_chunks = set(old_chunks) ^ set(new_chunks)
             changes.append({
                 'type': 'text_change',
                 'location': 'Content',
                 'before': old_text,
                 'after': new_text,
+                'changed_chunks': len(changed_chunks),
                 'timestamp': timestamp
             })
 
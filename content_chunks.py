@@ -0,0 +1,7 @@
+import hashlib
+from typing import List
+
+def chunk_hashes(text: str) -> List[str]:
+    """Hash each paragraph of text so changed regions can be found by set comparison"""
+    return [hashlib.blake2b(chunk.encode(), digest_size=16).hexdigest()
+            for chunk in (text or '').split('\n\n')]
@@ -4,6 +4,7 @@ import html
 from typing import Tuple, List, Optional, Dict
 import base64
 from io import BytesIO
+from collections import Counter
 
 class DiffVisualizer:
     def __init__(self, key_prefix: str = ""):
@@ -28,19 +29,35 @@ class DiffVisualizer:
         }
         self.current_scheme = "Default"
 
-    def _create_widget_key(self, base_key: str) -> str:
+    def _create_widget_key(self, base_key: str, key_prefix: Optional[str] = None) -> str:
         """Create a unique key for Streamlit widgets"""
-        return f"{self.key_prefix}_{base_key}" if self.key_prefix else base_key
+        if key_prefix is None:
+            key_prefix = self.key_prefix
+        return f"{key_prefix}_{base_key}" if key_prefix else base_key
 
     def _create_diff(self, text1: str, text2: str, char_level: bool = False) -> List[Tuple[int, str]]:
         """Creates diff with option for character or word level comparison"""
         if char_level:
             return self.dmp.diff_main(text1, text2)
 
-        # Word level diff
-        words1 = text1.split()
-        words2 = text2.split()
-        return self.dmp.diff_main(" ".join(words1), " ".join(words2))
+        # Word level diff: map each word to a single character (the space
+        # between words is character 0) so diff_main compares tokens instead
+        # of every character. str.split does the tokenizing in C.
+        vocabulary = {}
+        tokens = [' ']
+        encoded = []
+        for text in (text1, text2):
+            chars = []
+            for word in text.split():
+                char = vocabulary.get(word)
+                if char is None:
+                    char = vocabulary[word] = chr(len(tokens))
+                    tokens.append(word)
+                chars.append(char)
+            encoded.append('\x00'.join(chars))
+
+        diffs = self.dmp.diff_main(encoded[0], encoded[1], False)
+        return [(op, ''.join(tokens[ord(c)] for c in chars)) for op, chars in diffs]
 
     def create_side_by_side_diff(self, text1: str, text2: str, char_level: bool = False) -> Tuple[str, str]:
         """Creates side-by-side diff visualization"""
@@ -51,15 +68,21 @@ class DiffVisualizer:
         right_html = []
         colors = self.color_schemes[self.current_scheme]
 
+        # Opening tags depend only on the scheme, so build them once per call
+        equal_open = f'<span style="background-color: {colors["unchanged"]}">'
+        deletion_open = f'<span style="background-color: {colors["deletion"]}; text-decoration: line-through;">'
+        insertion_open = f'<span style="background-color: {colors["insertion"]}; font-weight: bold;">'
+
         for op, text in diffs:
             text = html.escape(text)
             if op == 0:  # Equal
-                left_html.append(f'<span style="background-color: {colors["unchanged"]}">{text}</span>')
-                right_html.append(f'<span style="background-color: {colors["unchanged"]}">{text}</span>')
+                span = f'{equal_open}{text}</span>'
+                left_html.append(span)
+                right_html.append(span)
             elif op == -1:  # Deletion
-                left_html.append(f'<span style="background-color: {colors["deletion"]}; text-decoration: line-through;">{text}</span>')
+                left_html.append(f'{deletion_open}{text}</span>')
             elif op == 1:  # Insertion
-                right_html.append(f'<span style="background-color: {colors["insertion"]}; font-weight: bold;">{text}</span>')
+                right_html.append(f'{insertion_open}{text}</span>')
 
         return ''.join(left_html), ''.join(right_html)
 
@@ -71,27 +94,30 @@ class DiffVisualizer:
         html_parts = []
         colors = self.color_schemes[self.current_scheme]
 
+        # Opening tags depend only on the scheme, so build them once per call
+        deletion_open = f'<span style="background-color: {colors["deletion"]}; text-decoration: line-through;">'
+        insertion_open = f'<span style="background-color: {colors["insertion"]}; font-weight: bold;">'
+
         for op, text in diffs:
             text = html.escape(text)
             if op == 0:  # Equal
                 html_parts.append(text)
             elif op == -1:  # Deletion
-                html_parts.append(f'<span style="background-color: {colors["deletion"]}; text-decoration: line-through;">{text}</span>')
+                html_parts.append(f'{deletion_open}{text}</span>')
             elif op == 1:  # Insertion
-                html_parts.append(f'<span style="background-color: {colors["insertion"]}; font-weight: bold;">{text}</span>')
+                html_parts.append(f'{insertion_open}{text}</span>')
 
         return ''.join(html_parts)
 
     def get_diff_stats(self, before: str, after: str) -> dict:
         """Calculate statistics about the changes"""
-        diffs = self.dmp.diff_main(before, after)
-        self.dmp.diff_cleanupSemantic(diffs)
-
-        def count_words(text: str) -> int:
-            return len(text.split())
+        # Word multiset differences give the add/remove counts in one pass,
+        # without running a full diff just for the numbers
+        before_words = Counter(before.split())
+        after_words = Counter(after.split())
 
-        words_added = sum(count_words(text) for op, text in diffs if op == 1)
-        words_removed = sum(count_words(text) for op, text in diffs if op == -1)
+        words_added = sum((after_words - before_words).values())
+        words_removed = sum((before_words - after_words).values())
 
         # Count total changes as the sum of added and removed words
         total_changes = words_added + words_removed
@@ -102,9 +128,11 @@ class DiffVisualizer:
             'total_changes': total_changes
         }
 
-    def export_diff_html(self, before: str, after: str, char_level: bool = False) -> str:
+    def export_diff_html(self, before: str, after: str, char_level: bool = False,
+                         view_mode: Optional[str] = None) -> str:
         """Export the diff as standalone HTML"""
-        view_mode = st.session_state.get(self._create_widget_key('diff_view_mode'))
+        if view_mode is None:
+            view_mode = st.session_state.get(self._create_widget_key('diff_view_mode'))
         if view_mode == 'side-by-side':
             left_diff, right_diff = self.create_side_by_side_diff(before, after, char_level)
             html_content = f"""
@@ -148,8 +176,9 @@ class DiffVisualizer:
 
         return html_content
 
-    def visualize_diff(self, before: str, after: str):
+    def visualize_diff(self, before: str, after: str, key_prefix: Optional[str] = None):
         """Display the diff visualization in Streamlit with advanced options"""
+        # A per-call key_prefix lets one instance render many diff widgets
         st.markdown("### Change Details")
 
         # Diff options section using columns
@@ -161,13 +190,13 @@ class DiffVisualizer:
             view_mode = st.radio(
                 "View Mode",
                 ['inline', 'side-by-side'],
-                key=self._create_widget_key('diff_view_mode')
+                key=self._create_widget_key('diff_view_mode', key_prefix)
             )
 
             # Comparison level
             char_level = st.checkbox(
                 "Character-level comparison",
-                key=self._create_widget_key('char_level_diff'),
+                key=self._create_widget_key('char_level_diff', key_prefix),
                 help="Compare character by character instead of word by word"
             )
 
@@ -176,11 +205,11 @@ class DiffVisualizer:
             self.current_scheme = st.selectbox(
                 "Color Scheme",
                 options=list(self.color_schemes.keys()),
-                key=self._create_widget_key('color_scheme')
+                key=self._create_widget_key('color_scheme', key_prefix)
             )
 
         # Calculate and display statistics
-        stats = self.get_diff_stats(before, after)
+        stats = cached_diff_stats(before, after)
         stat_cols = st.columns(3)
         with stat_cols[0]:
             st.metric("Words Added", stats['words_added'])
@@ -191,7 +220,7 @@ class DiffVisualizer:
 
         # Display the diff based on selected view mode
         if view_mode == 'side-by-side':
-            left_diff, right_diff = self.create_side_by_side_diff(before, after, char_level)
+            left_diff, right_diff = cached_side_by_side_diff(before, after, char_level, self.current_scheme)
             cols = st.columns(2)
             with cols[0]:
                 st.markdown("#### Before")
@@ -206,7 +235,7 @@ class DiffVisualizer:
                     unsafe_allow_html=True
                 )
         else:
-            inline_diff = self.create_inline_diff(before, after, char_level)
+            inline_diff = cached_inline_diff(before, after, char_level, self.current_scheme)
             st.markdown(
                 f'<div style="border: 1px solid #ddd; border-radius: 5px; padding: 15px; '
                 f'margin: 10px 0; background-color: white; font-family: monospace; '
@@ -220,8 +249,29 @@ class DiffVisualizer:
             )
 
         # Export options
-        if st.button("Export as HTML", key=self._create_widget_key('export_button')):
-            html_content = self.export_diff_html(before, after, char_level)
+        if st.button("Export as HTML", key=self._create_widget_key('export_button', key_prefix)):
+            html_content = self.export_diff_html(before, after, char_level, view_mode)
             b64 = base64.b64encode(html_content.encode()).decode()
             href = f'<a href="data:text/html;base64,{b64}" download="diff_export.html">Download HTML</a>'
-            st.markdown(href, unsafe_allow_html=True)
\ No newline at end of file
+            st.markdown(href, unsafe_allow_html=True)
+
+# Streamlit reruns visualize_diff and the timeline tab in main.py on every
+# interaction; cache the diff work so unchanged texts are only diffed once
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_diff_stats(before: str, after: str) -> dict:
+    """Cached DiffVisualizer.get_diff_stats"""
+    return DiffVisualizer().get_diff_stats(before, after)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_inline_diff(before: str, after: str, char_level: bool, scheme: str) -> str:
+    """Cached DiffVisualizer.create_inline_diff for a color scheme"""
+    visualizer = DiffVisualizer()
+    visualizer.current_scheme = scheme
+    return visualizer.create_inline_diff(before, after, char_level)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_side_by_side_diff(before: str, after: str, char_level: bool, scheme: str) -> Tuple[str, str]:
+    """Cached DiffVisualizer.create_side_by_side_diff for a color scheme"""
+    visualizer = DiffVisualizer()
+    visualizer.current_scheme = scheme
+    return visualizer.create_side_by_side_diff(before, after, char_level)
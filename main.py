@@ -7,7 +7,7 @@ from change_detector import ChangeDetector
 from notifier import EmailNotifier
 from data_manager import DataManager
 from apscheduler.schedulers.background import BackgroundScheduler
-from diff_visualizer import DiffVisualizer
+from diff_visualizer import DiffVisualizer, cached_diff_stats, cached_inline_diff, cached_side_by_side_diff
 from bs4 import BeautifulSoup
 from timeline_visualizer import TimelineVisualizer
 from change_summarizer import ChangeSummarizer
@@ -375,16 +375,20 @@ with tab1:
             # Convert changes to DataFrame for analysis
             changes_df = pd.DataFrame([
                 {
-                    'timestamp': datetime.fromisoformat(c['timestamp']),
+                    'timestamp': c['timestamp'],
                     'type': c['type'],
                     'url': c['url']
                 }
                 for c in all_changes
             ])
+            # Parse every timestamp in one vectorized call; stored changes mix
+            # naive and UTC-offset ISO strings, so normalise them to UTC
+            changes_df['timestamp'] = pd.to_datetime(changes_df['timestamp'], format='ISO8601', utc=True)
 
-            # Group changes by date and type
+            # Group changes by date and type; midnight datetime64 keys keep
+            # the grouping in NumPy instead of building Python date objects
             daily_changes = changes_df.groupby([
-                changes_df['timestamp'].dt.date,
+                changes_df['timestamp'].dt.tz_localize(None).dt.normalize(),
                 'type'
             ]).size().unstack(fill_value=0)
 
@@ -602,11 +606,14 @@ with tab3:
                                 # Show change content with enhanced diff visualization
                                 if change['type'] in ['text_change', 'menu_structure_change']:
                                     if 'before' in change and 'after' in change:
-                                        # Use the DiffVisualizer to show changes
+                                        # Use the DiffVisualizer to show changes; the cached
+                                        # helpers skip re-diffing unchanged texts on reruns
                                         if diff_view_mode == "Side by Side":
-                                            left_diff, right_diff = timeline_diff_viz.create_side_by_side_diff(
+                                            left_diff, right_diff = cached_side_by_side_diff(
                                                 change['before'],
-                                                change['after']
+                                                change['after'],
+                                                False,
+                                                timeline_diff_viz.current_scheme
                                             )
                                             cols = st.columns(2)
                                             with cols[0]:
@@ -617,14 +624,16 @@ with tab3:
                                                 st.markdown(right_diff, unsafe_allow_html=True)
                                         else:
                                             st.markdown("**Changes:**")
-                                            inline_diff = timeline_diff_viz.create_inline_diff(
+                                            inline_diff = cached_inline_diff(
                                                 change['before'],
-                                                change['after']
+                                                change['after'],
+                                                False,
+                                                timeline_diff_viz.current_scheme
                                             )
                                             st.markdown(inline_diff, unsafe_allow_html=True)
 
                                         # Show diff statistics
-                                        stats = timeline_diff_viz.get_diff_stats(change['before'], change['after'])
+                                        stats = cached_diff_stats(change['before'], change['after'])
                                         stat_cols = st.columns(3)
                                         with stat_cols[0]:
                                             st.metric("Words Added", stats['words_added'])
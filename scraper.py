@@ -1,20 +1,38 @@
 import trafilatura
-from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
 import requests
-from typing import Dict, Any, List, Set
-from urllib.parse import urlparse, urljoin
+from typing import Dict, Any, List
+from urllib.parse import urlparse, urljoin, parse_qsl, urlencode
 import time
 import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import re # Added for regex in _extract_links
 from screenshot_manager import ScreenshotManager
+from content_chunks import chunk_hashes
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 
+# Matches URLs assigned via window.location.href in onclick handlers
+_ONCLICK_URL_RE = re.compile(r'window\.location\.href=[\'"]([^\'"]+)[\'"]')
+
+# Elements that can carry crawlable links: anchors and onclick handlers
+_LINK_XPATH = '//a[@href] | //*[@onclick]'
+
+# Elements used for the text fallback when trafilatura returns nothing
+_TEXT_FALLBACK_XPATH = '//p|//h1|//h2|//h3|//h4|//h5|//h6'
+
+# Page text is fed to lxml as UTF-8 bytes; the explicit encoding overrides any
+# XML declaration or meta charset left over from the original response
+_UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
 class WebScraper:
     def __init__(self):
         self.headers = {
@@ -23,11 +41,14 @@ class WebScraper:
             'Accept-Language': 'en-US,en;q=0.5'
         }
         self.screenshot_manager = ScreenshotManager()
-        self.visited_urls = set()
-        self._logs = []
+        self.visited_urls = set()  # Dedup keys from _canonical_url
+        self._logs = deque(maxlen=10000)  # Bounded so long crawls can't grow it forever
+        self.verbose = False  # Log per-link details (slow on link-heavy crawls)
         self.session = requests.Session()
         self.retry_count = 3
         self.retry_delay = 2
+        self.max_scroll_rounds = 10  # Upper bound for infinite-scroll pages
+        self.scroll_settle_timeout = 1  # Seconds to wait for lazy content to grow the page
 
         # Configure Chrome options for Replit environment
         chrome_options = Options()
@@ -55,8 +76,10 @@ class WebScraper:
         except:
             pass
 
-    def _log(self, message: str):
-        """Add a log message with timestamp"""
+    def _log(self, message: str, verbose: bool = False):
+        """Add a log message with timestamp; verbose messages are skipped unless enabled"""
+        if verbose and not self.verbose:
+            return
         timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
         log_entry = f"[{timestamp}] {message}"
         print(log_entry)  # Print to console for immediate feedback
@@ -64,6 +87,18 @@ class WebScraper:
 
     def _normalize_url(self, url: str) -> str:
         """Normalize URL and standardize domain format"""
+        # Fast path: most links are already normalized, so skip urlparse when
+        # there's nothing to rewrite (no query, fragment, params or www.,
+        # lowercase host)
+        if url.startswith('https://') and not any(c in url for c in '?#;\t\r\n '):
+            slash = url.find('/', 8)
+            host = url[8:slash] if slash > 0 else url[8:]
+            if host and host == host.lower() and not host.startswith('www.'):
+                return url if slash > 0 else url + '/'
+        return self._normalize_url_full(url)
+
+    def _normalize_url_full(self, url: str) -> str:
+        """Normalize any URL via urlparse; the slow path of _normalize_url"""
         try:
             # Handle URLs without scheme
             if not url.startswith(('http://', 'https://')):
@@ -87,13 +122,25 @@ class WebScraper:
             if query:
                 final_url += f"?{query}"
 
-            self._log(f"Normalized URL: {url} -> {final_url}")
             return final_url
 
         except Exception as e:
             self._log(f"Error normalizing URL {url}: {str(e)}")
             raise Exception(f"Invalid URL format: {url}")
 
+    def _canonical_url(self, url: str) -> str:
+        """Return the dedup key for a normalized URL"""
+        # Sorting the parameters and dropping trailing slashes gives every
+        # permutation of the same page one key. The key is only used to spot
+        # repeats; pages are still fetched and stored under their own URL,
+        # since /docs/ and /docs resolve relative links differently
+        if '?' not in url and (not url.endswith('/') or url.count('/') == 3):
+            return url
+        parsed = urlparse(url)
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        path = parsed.path.rstrip('/') or '/'
+        return f"https://{parsed.netloc}{path}" + (f"?{query}" if query else '')
+
     def _is_valid_internal_link(self, url: str, base_domain: str) -> bool:
         """Check if URL is a valid internal link"""
         try:
@@ -122,8 +169,6 @@ class WebScraper:
                 not url.endswith(base_domain)  # Avoid duplicate root URLs
             )
 
-            if is_valid:
-                self._log(f"Valid internal link found: {url}")
             return is_valid
 
         except Exception as e:
@@ -145,26 +190,46 @@ class WebScraper:
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
 
-            # Scroll multiple times to trigger lazy loading
-            for _ in range(3):
-                self.driver.execute_script(
-                    "window.scrollTo(0, document.body.scrollHeight);"
-                )
-                time.sleep(1)
+            # Scroll to the bottom until the page stops growing to trigger lazy
+            # loading; infinite-scroll pages are capped at max_scroll_rounds
+            for _ in range(self.max_scroll_rounds):
+                height = self.driver.execute_script("return document.body.scrollHeight")
+                self.driver.execute_script("window.scrollTo(0, arguments[0]);", height)
+                try:
+                    WebDriverWait(self.driver, self.scroll_settle_timeout).until(
+                        lambda d: d.execute_script("return document.body.scrollHeight") > height
+                    )
+                except TimeoutException:
+                    break
 
             return self.driver.page_source
         except Exception as e:
             self._log(f"Error getting dynamic content: {str(e)}")
             return None
 
-    def _extract_links(self, soup: BeautifulSoup, base_url: str, base_domain: str) -> Set[str]:
-        """Extract all valid internal links from the page"""
-        links = set()
+    def _extract_links(self, root, base_url: str, base_domain: str) -> Dict[str, str]:
+        """Extract valid internal links from the parsed page, keyed by _canonical_url"""
+        links = {}
         self._log(f"Extracting links from {base_url}")
 
-        # Find all <a> tags
-        for a in soup.find_all('a', href=True):
-            href = a.get('href', '').strip()
+        if root is None:
+            return links
+
+        # Collect raw hrefs from <a> tags and onclick handlers in one pass,
+        # de-duplicated so repeated menu/footer links are only processed once.
+        # A dict keeps document order, so when several variants of one page
+        # share a key the first one linked is the one crawled. Attributes come
+        # from the parsed tree, so comments and script text are never mistaken
+        # for markup
+        hrefs = {}
+        for element in root.xpath(_LINK_XPATH):
+            if element.tag == 'a' and element.get('href') is not None:
+                hrefs[element.get('href').strip()] = None
+            onclick = element.get('onclick')
+            if onclick:
+                hrefs.update(dict.fromkeys(_ONCLICK_URL_RE.findall(onclick)))
+
+        for href in hrefs:
             if href and not href.startswith(('javascript:', 'mailto:', 'tel:', '#', 'data:')):
                 try:
                     # Handle relative URLs
@@ -172,30 +237,56 @@ class WebScraper:
                     normalized_url = self._normalize_url(full_url)
 
                     if self._is_valid_internal_link(normalized_url, base_domain):
-                        links.add(normalized_url)
-                        self._log(f"Found valid link: {normalized_url}")
+                        links.setdefault(self._canonical_url(normalized_url), normalized_url)
+                        self._log(f"Found valid link: {normalized_url}", verbose=True)
                 except Exception as e:
                     self._log(f"Error processing link {href}: {str(e)}")
 
-        # Find links in onclick attributes and data attributes
-        for element in soup.find_all(attrs={'onclick': True}):
-            onclick = element.get('onclick', '')
-            urls = re.findall(r'window\.location\.href=[\'"]([^\'"]+)[\'"]', onclick)
-            for url in urls:
-                try:
-                    full_url = urljoin(base_url, url)
-                    normalized_url = self._normalize_url(full_url)
-                    if self._is_valid_internal_link(normalized_url, base_domain):
-                        links.add(normalized_url)
-                        self._log(f"Found onclick link: {normalized_url}")
-                except Exception as e:
-                    self._log(f"Error processing onclick URL {url}: {str(e)}")
-
         self._log(f"Extracted {len(links)} valid internal links")
         return links
 
+    def _parse_html(self, html_content: str):
+        """Parse page markup with lxml, or return None if it has no document"""
+        if not html_content or not html_content.strip():
+            return None
+        try:
+            return lxml.html.document_fromstring(html_content.encode('utf-8'), parser=_UTF8_HTML_PARSER)
+        except lxml.etree.ParserError:
+            # Nothing but comments or whitespace
+            return None
+
+    def _extract_fallback_text(self, root) -> str:
+        """Extract paragraph and heading text when trafilatura finds nothing"""
+        if root is None:
+            return ''
+        # text_content() runs in libxml2, avoiding a Python walk of each subtree
+        return ' '.join(e.text_content() for e in root.xpath(_TEXT_FALLBACK_XPATH))
+
+    def _resolve_screenshots(self, pages_data: List[Dict[str, Any]], screenshot_futures: Dict[int, Any]):
+        """Wait for background screenshot captures and attach their paths"""
+        for index, future in screenshot_futures.items():
+            page = pages_data[index]
+            try:
+                page['content']['screenshot_path'] = future.result()
+            except Exception as e:
+                self._log(f"Error capturing screenshot of {page['url']}: {str(e)}")
+                page['content']['screenshot_path'] = None
+
     def scrape_website(self, url: str, crawl_all_pages: bool = False, progress_callback=None) -> Dict[str, Any]:
         """Scrape website content with improved crawling logic"""
+        # Screenshots render on the screenshot manager's driver pool while the
+        # crawl carries on with the next page
+        try:
+            with ThreadPoolExecutor(max_workers=self.screenshot_manager.pool_size) as screenshot_executor:
+                return self._scrape_website(url, crawl_all_pages, progress_callback, screenshot_executor)
+        finally:
+            # All captures have finished once the executor exits, so shut the
+            # idle browsers down now rather than whenever GC runs __del__
+            self.screenshot_manager.close()
+
+    def _scrape_website(self, url: str, crawl_all_pages: bool, progress_callback,
+                        screenshot_executor: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Crawl the site, submitting screenshot captures to screenshot_executor"""
         try:
             self.clear_logs()
             self._log(f"Starting new crawl of {url}")
@@ -220,6 +311,7 @@ class WebScraper:
 
             # Reset visited URLs for new crawl
             self.visited_urls.clear()
+            self.visited_urls.add(self._canonical_url(url))
 
             # Get initial page content
             response = self.session.get(url, headers=self.headers, timeout=30)
@@ -235,24 +327,26 @@ class WebScraper:
                 self._log("Using static content from requests")
                 html_content = initial_content
 
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # Parse once for both the text fallback and link extraction
+            root = self._parse_html(html_content)
 
             # Extract text content
             downloaded = trafilatura.fetch_url(url)
             if downloaded:
                 text_content = trafilatura.extract(downloaded)
             else:
-                text_content = ' '.join([p.get_text() for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])])
+                text_content = self._extract_fallback_text(root)
 
-            # Extract links
-            links = self._extract_links(soup, url, base_domain)
+            # Extract links, resolved against the URL the page was served from
+            links = self._extract_links(root, response.url, base_domain)
             self.total_discovered_pages += len(links)  # Add discovered links to total
             self._log(f"Found {len(links)} links on initial page")
             self._log(f"Total pages to scan: {self.total_discovered_pages}")
 
-            # Take screenshot
-            screenshot_path = self.screenshot_manager.capture_screenshot(url)
+            # Take screenshot in the background
+            screenshot_futures = {
+                0: screenshot_executor.submit(self.screenshot_manager.capture_screenshot, url)
+            }
             self.processed_pages += 1
 
             # Update progress after processing initial page
@@ -268,101 +362,112 @@ class WebScraper:
                     'url': url,
                     'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
                     'text_content': text_content,
-                    'links': list(links),
+                    'links': list(links.values()),
                     'content_hash': hash(text_content),
-                    'screenshot_path': screenshot_path
+                    'content_chunks': chunk_hashes(text_content),
+                    'screenshot_path': None  # Filled in by _resolve_screenshots
                 }
             }]
 
             if crawl_all_pages:
-                urls_to_visit = links - self.visited_urls
+                # Pending pages keyed by _canonical_url
+                urls_to_visit = {key: link for key, link in links.items() if key not in self.visited_urls}
                 self._log(f"Found {len(urls_to_visit)} new pages to crawl")
 
+                # urls_to_visit only ever receives unvisited links and a page
+                # is discarded from it once visited, so no re-check is needed
                 while urls_to_visit and len(self.visited_urls) < 100:
-                    next_url = urls_to_visit.pop()
-                    if next_url not in self.visited_urls:
-                        try:
-                            elapsed_time = time.time() - self.start_time
-                            avg_time_per_page = elapsed_time / self.processed_pages if self.processed_pages > 0 else 0
-                            remaining_pages = self.total_discovered_pages - self.processed_pages
-                            estimated_time = avg_time_per_page * remaining_pages
-
-                            self._log(f"Progress: {self.processed_pages}/{self.total_discovered_pages} pages")
-                            self._log(f"Estimated time remaining: {int(estimated_time)} seconds")
-                            self._log(f"Crawling: {next_url}")
-
-                            # Update progress before processing next page
-                            if progress_callback:
-                                progress_callback(self.processed_pages, self.total_discovered_pages, elapsed_time)
-
-                            time.sleep(random.uniform(1, 2))  # Polite delay
-
-                            response = self.session.get(next_url, headers=self.headers, timeout=30)
-                            response.raise_for_status()
-                            html_content = response.text
-
-                            # Try dynamic content
-                            dynamic_content = self._get_dynamic_content(next_url)
-                            if dynamic_content:
-                                html_content = dynamic_content
-
-                            soup = BeautifulSoup(html_content, 'html.parser')
-
-                            # Extract text
-                            downloaded = trafilatura.fetch_url(next_url)
-                            if downloaded:
-                                text_content = trafilatura.extract(downloaded)
-                            else:
-                                text_content = ' '.join([p.get_text() for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])])
-
-                            # Extract more links
-                            new_links = self._extract_links(soup, next_url, base_domain)
-                            new_unvisited_links = new_links - self.visited_urls
-                            urls_to_visit.update(new_unvisited_links)
-
-                            # Update total discovered pages
-                            self.total_discovered_pages += len(new_unvisited_links)
-
-                            # Take screenshot
-                            screenshot_path = self.screenshot_manager.capture_screenshot(next_url)
-
-                            # Add to visited pages
-                            self.visited_urls.add(next_url)
-                            parsed_url = urlparse(next_url)
-                            location = parsed_url.path if parsed_url.path else '/'
-
-                            pages_data.append({
+                    next_key, next_url = urls_to_visit.popitem()
+                    try:
+                        elapsed_time = time.time() - self.start_time
+                        avg_time_per_page = elapsed_time / self.processed_pages if self.processed_pages > 0 else 0
+                        remaining_pages = self.total_discovered_pages - self.processed_pages
+                        estimated_time = avg_time_per_page * remaining_pages
+
+                        self._log(f"Progress: {self.processed_pages}/{self.total_discovered_pages} pages")
+                        self._log(f"Estimated time remaining: {int(estimated_time)} seconds")
+                        self._log(f"Crawling: {next_url}")
+
+                        # Update progress before processing next page
+                        if progress_callback:
+                            progress_callback(self.processed_pages, self.total_discovered_pages, elapsed_time)
+
+                        time.sleep(random.uniform(1, 2))  # Polite delay
+
+                        response = self.session.get(next_url, headers=self.headers, timeout=30)
+                        response.raise_for_status()
+                        html_content = response.text
+
+                        # Try dynamic content
+                        dynamic_content = self._get_dynamic_content(next_url)
+                        if dynamic_content:
+                            html_content = dynamic_content
+
+                        root = self._parse_html(html_content)
+
+                        # Extract text
+                        downloaded = trafilatura.fetch_url(next_url)
+                        if downloaded:
+                            text_content = trafilatura.extract(downloaded)
+                        else:
+                            text_content = self._extract_fallback_text(root)
+
+                        # Extract more links
+                        new_links = self._extract_links(root, response.url, base_domain)
+                        new_unvisited_links = {
+                            key: link for key, link in new_links.items() if key not in self.visited_urls
+                        }
+                        urls_to_visit.update(new_unvisited_links)
+
+                        # Update total discovered pages
+                        self.total_discovered_pages += len(new_unvisited_links)
+
+                        # Add to visited pages; the page may have linked to itself
+                        self.visited_urls.add(next_key)
+                        urls_to_visit.pop(next_key, None)
+                        parsed_url = urlparse(next_url)
+                        location = parsed_url.path if parsed_url.path else '/'
+
+                        pages_data.append({
+                            'url': next_url,
+                            'location': location,
+                            'content': {
                                 'url': next_url,
-                                'location': location,
-                                'content': {
-                                    'url': next_url,
-                                    'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                                    'text_content': text_content,
-                                    'links': list(new_links),
-                                    'content_hash': hash(text_content),
-                                    'screenshot_path': screenshot_path
-                                }
-                            })
-
-                            self.processed_pages += 1
-                            self._log(f"Successfully crawled {next_url}")
-                            self._log(f"Found {len(new_links)} new links")
-
-                        except Exception as e:
-                            self._log(f"Error crawling {next_url}: {str(e)}")
-                            continue
-
+                                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                'text_content': text_content,
+                                'links': list(new_links.values()),
+                                'content_hash': hash(text_content),
+                                'content_chunks': chunk_hashes(text_content),
+                                'screenshot_path': None
+                            }
+                        })
+
+                        # Take screenshot in the background
+                        screenshot_futures[len(pages_data) - 1] = screenshot_executor.submit(
+                            self.screenshot_manager.capture_screenshot, next_url
+                        )
+
+                        self.processed_pages += 1
+                        self._log(f"Successfully crawled {next_url}")
+                        self._log(f"Found {len(new_links)} new links")
+
+                    except Exception as e:
+                        self._log(f"Error crawling {next_url}: {str(e)}")
+                        continue
+
+            self._resolve_screenshots(pages_data, screenshot_futures)
             self._log(f"Crawl completed. Total pages found: {len(pages_data)}")
 
             return {
                 'url': url,
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
                 'text_content': pages_data[0]['content']['text_content'],
-                'links': list(links),
+                'links': list(links.values()),
                 'content_hash': pages_data[0]['content']['content_hash'],
+                'content_chunks': pages_data[0]['content']['content_chunks'],
                 'screenshot_path': pages_data[0]['content']['screenshot_path'],
                 'pages': pages_data,
-                'crawler_logs': self._logs,
+                'crawler_logs': list(self._logs),
                 'progress': {
                     'total_pages': self.total_discovered_pages,
                     'processed_pages': self.processed_pages,
@@ -376,7 +481,7 @@ class WebScraper:
             raise Exception(error_msg)
 
     def get_logs(self):
-        return self._logs
+        return list(self._logs)
 
     def clear_logs(self):
-        self._logs = []
\ No newline at end of file
+        self._logs.clear()
\ No newline at end of file
@@ -3,14 +3,35 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service as ChromeService
-from PIL import Image, ImageDraw
+from PIL import Image
+import numpy as np
 import io
 from datetime import datetime, timedelta
 import base64
+import threading
 
 class ScreenshotManager:
     def __init__(self):
         self.screenshot_dir = "screenshots"
+        # Encoding requested from Chrome's DevTools screenshot API; WebP is
+        # several times smaller and cheaper to encode than PNG
+        self.screenshot_format = "webp"
+        self.screenshot_quality = 85
+        # Encoding for the before/after images returned as base64; JPEG is far
+        # cheaper to encode than PNG for full-size screenshots
+        self.comparison_format = "JPEG"
+        self.comparison_quality = 90
+        # The diff image marks exact changed pixels, so it must stay lossless;
+        # JPEG's chroma subsampling smears the red highlights away
+        self.diff_format = "PNG"
+        # Browsers are reused across captures and checked out one per task,
+        # so up to pool_size pages can render in parallel
+        self.pool_size = 4
+        self._idle_drivers = []
+        self._drivers_created = 0
+        # Guards the two fields above; waiters are woken whenever a driver
+        # is returned or a pool slot is freed
+        self._pool_condition = threading.Condition()
         self._ensure_screenshot_dir()
         self._cleanup_old_screenshots()
 
@@ -38,20 +59,73 @@ class ScreenshotManager:
                 except OSError as e:
                     print(f"Error removing old screenshot {filepath}: {e}")
 
+    def _create_driver(self):
+        """Start a headless Chrome instance for screenshots"""
+        # Configure Chrome options for Replit environment
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-gpu")
+
+        # Use ChromeDriver directly
+        return webdriver.Chrome(options=chrome_options)
+
+    def _checkout_driver(self):
+        """Take an idle driver from the pool, starting one if the pool isn't full"""
+        with self._pool_condition:
+            # Re-check both options on every wake-up: a slot freed by a
+            # discarded driver is as good as a returned driver
+            while not self._idle_drivers and self._drivers_created >= self.pool_size:
+                self._pool_condition.wait()
+            if self._idle_drivers:
+                return self._idle_drivers.pop()
+            self._drivers_created += 1
+        try:
+            return self._create_driver()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _return_driver(self, driver):
+        """Put a healthy driver back in the pool for the next capture"""
+        with self._pool_condition:
+            self._idle_drivers.append(driver)
+            self._pool_condition.notify()
+
+    def _release_slot(self):
+        """Free a pool slot and wake a caller waiting for a driver"""
+        with self._pool_condition:
+            self._drivers_created -= 1
+            self._pool_condition.notify()
+
+    def _discard_driver(self, driver):
+        """Quit a driver that may be in a bad state and free its pool slot"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def close(self):
+        """Quit all idle pooled drivers"""
+        with self._pool_condition:
+            idle_drivers, self._idle_drivers = self._idle_drivers, []
+        for driver in idle_drivers:
+            self._discard_driver(driver)
+
+    def __del__(self):
+        """Cleanup pooled drivers"""
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def capture_screenshot(self, url: str) -> str:
         """Capture website screenshot using Selenium"""
         try:
-            # Configure Chrome options for Replit environment
-            chrome_options = Options()
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--remote-debugging-port=9222")
-
-            # Use ChromeDriver directly
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = self._checkout_driver()
 
             try:
                 print(f"Navigating to URL: {url}")
@@ -59,73 +133,134 @@ class ScreenshotManager:
                 driver.implicitly_wait(5)  # Wait for page to load
 
                 print("Capturing screenshot...")
-                screenshot = driver.get_screenshot_as_png()
+                # Ask Chrome for the encoded image directly over CDP instead of
+                # round-tripping a PNG through the WebDriver protocol
+                result = driver.execute_cdp_cmd('Page.captureScreenshot', {
+                    'format': self.screenshot_format,
+                    'quality': self.screenshot_quality
+                })
+                screenshot = base64.b64decode(result['data'])
+            except Exception:
+                self._discard_driver(driver)
+                raise
 
-                # Save screenshot with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = os.path.join(
-                    self.screenshot_dir,
-                    f"{url.replace('://', '_').replace('/', '_')}_{timestamp}.png"
-                )
+            self._return_driver(driver)
 
-                print(f"Saving screenshot to: {filename}")
-                with open(filename, "wb") as f:
-                    f.write(screenshot)
+            # Save screenshot with timestamp
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            filename = os.path.join(
+                self.screenshot_dir,
+                f"{url.replace('://', '_').replace('/', '_')}_{timestamp}.{self.screenshot_format}"
+            )
 
-                return filename
+            print(f"Saving screenshot to: {filename}")
+            with open(filename, "wb") as f:
+                f.write(screenshot)
 
-            finally:
-                driver.quit()
+            return filename
 
         except Exception as e:
             error_msg = f"Failed to capture screenshot: {str(e)}"
             print(error_msg)
             raise Exception(error_msg)
 
-    def compare_screenshots(self, before_path: str, after_path: str) -> tuple:
+    def _open_image(self, source) -> Image.Image:
+        """Open a screenshot from a path, file object, raw bytes, array or image"""
+        if isinstance(source, Image.Image):
+            return source
+        if isinstance(source, np.ndarray):
+            return Image.fromarray(source)
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        return Image.open(source)
+
+    def compare_screenshots(self, before_path, after_path) -> tuple:
         """Compare two screenshots and highlight differences"""
         try:
-            # Open images
-            before_img = Image.open(before_path)
-            after_img = Image.open(after_path)
-
-            # Ensure same size
-            size = (1920, 1080)  # Standard size
-            before_img = before_img.resize(size)
-            after_img = after_img.resize(size)
-
-            # Convert to RGB
-            before_img = before_img.convert('RGB')
-            after_img = after_img.convert('RGB')
-
-            # Create diff image
-            diff_img = Image.new('RGB', size)
-            draw = ImageDraw.Draw(diff_img)
-
-            # Compare pixels
-            for x in range(size[0]):
-                for y in range(size[1]):
-                    before_pixel = before_img.getpixel((x, y))
-                    after_pixel = after_img.getpixel((x, y))
-
-                    if before_pixel != after_pixel:
-                        # Highlight difference in red
-                        draw.point((x, y), fill='red')
-                    else:
-                        # Keep original pixel
-                        diff_img.putpixel((x, y), after_pixel)
+            # Open images; only paths touch the disk
+            before_img = self._open_image(before_path)
+            # Identical paths or bytes (a memcmp) only need decoding once
+            if isinstance(before_path, (str, bytes, bytearray)) and type(before_path) is type(after_path) \
+                    and before_path == after_path:
+                after_img = before_img
+            else:
+                after_img = self._open_image(after_path)
+        except Exception as e:
+            error_msg = f"Failed to compare screenshots: {str(e)}"
+            print(error_msg)
+            raise Exception(error_msg)
+
+        return self.compare_screenshot_images(before_img, after_img)
+
+    def _prepare_images(self, before_img: Image.Image, after_img: Image.Image) -> tuple:
+        """Resize both images to the standard size in RGB"""
+        # Ensure same size
+        size = (1920, 1080)  # Standard size
+        if before_img is after_img:
+            prepared = before_img.resize(size).convert('RGB')
+            return prepared, prepared
+        before_img = before_img.resize(size)
+        after_img = after_img.resize(size)
+
+        # Convert to RGB
+        return before_img.convert('RGB'), after_img.convert('RGB')
+
+    def _diff_stats(self, changed_pixels: int, total_pixels: int) -> dict:
+        """Build the pixel count summary for a comparison"""
+        return {
+            'changed_pixels': changed_pixels,
+            'total_pixels': total_pixels,
+            'changed_percent': 100.0 * changed_pixels / total_pixels
+        }
+
+    def compare_screenshot_images(self, before_img: Image.Image, after_img: Image.Image,
+                                  with_stats: bool = False) -> tuple:
+        """Compare two in-memory images and highlight differences"""
+        try:
+            before_img, after_img = self._prepare_images(before_img, after_img)
 
             # Convert images to base64 for display
-            def img_to_base64(img):
+            def img_to_base64(img, image_format=self.comparison_format):
                 buffered = io.BytesIO()
-                img.save(buffered, format="PNG")
-                return base64.b64encode(buffered.getvalue()).decode()
+                if image_format == "JPEG":
+                    img.save(buffered, format="JPEG", quality=self.comparison_quality)
+                elif image_format == "PNG":
+                    # Display-only output, so favour encode speed over size
+                    img.save(buffered, format="PNG", compress_level=1)
+                else:
+                    img.save(buffered, format=image_format)
+                # Encode straight from the buffer's memory rather than a copy of it
+                return base64.b64encode(buffered.getbuffer()).decode('ascii')
+
+            before_arr = np.asarray(before_img)
+            after_arr = np.asarray(after_img)
+
+            # Identical screenshots have nothing to highlight, so the before
+            # and after views share one encoding and the diff is the same image
+            if before_img is after_img or np.array_equal(before_arr, after_arr):
+                encoded = img_to_base64(after_img)
+                images = (encoded, encoded, img_to_base64(after_img, self.diff_format))
+                if with_stats:
+                    # Nothing changed, so skip building the mask
+                    return images + (self._diff_stats(0, before_arr.shape[0] * before_arr.shape[1]),)
+                return images
+
+            # Highlight differing pixels in red over the after image; the
+            # comparison runs on whole arrays instead of per-pixel Python calls
+            changed = (before_arr != after_arr).any(axis=2)
+            diff_arr = after_arr.copy()
+            diff_arr[changed] = (255, 0, 0)
+            diff_img = Image.fromarray(diff_arr)
 
-            return (
+            images = (
                 img_to_base64(before_img),
                 img_to_base64(after_img),
-                img_to_base64(diff_img)
+                img_to_base64(diff_img, self.diff_format)
             )
+            # Reuse the mask for the pixel counts instead of comparing again
+            if with_stats:
+                return images + (self._diff_stats(int(np.count_nonzero(changed)), changed.size),)
+            return images
 
         except Exception as e:
             error_msg = f"Failed to compare screenshots: {str(e)}"
@@ -1,5 +1,6 @@
 import pytest
 from change_detector import ChangeDetector
+from content_chunks import chunk_hashes
 from datetime import datetime
 
 def test_change_detection():
@@ -121,3 +122,24 @@ def test_first_run():
     assert len(changes) == 1
     assert changes[0]['type'] == 'site_check'
     assert 'pages' in changes[0]
+
+def test_changed_chunks():
+    detector = ChangeDetector()
+
+    # Only the second paragraph differs
+    detector.previous_content = {
+        'text': 'Intro\n\nOld offer\n\nFooter',
+        'pages': [{'url': 'example.com', 'location': '/'}]
+    }
+    current = {
+        'text': 'Intro\n\nNew offer\n\nFooter',
+        'pages': [{'url': 'example.com', 'location': '/'}]
+    }
+
+    changes = detector.detect_changes(current)
+
+    text_changes = [c for c in changes if c['type'] == 'text_change']
+    assert len(text_changes) == 1
+    # One paragraph removed, one added
+    assert text_changes[0]['changed_chunks'] == 2
+    assert current['content_chunks'] == chunk_hashes('Intro\n\nNew offer\n\nFooter')
@@ -0,0 +1,83 @@
+import pytest
+from collections import deque
+
+# scraper imports trafilatura, which needs its full dependency set
+pytest.importorskip("trafilatura", exc_type=ImportError)
+from scraper import WebScraper
+
+@pytest.fixture
+def scraper():
+    # Skip __init__ so the tests don't start a Chrome WebDriver
+    web_scraper = WebScraper.__new__(WebScraper)
+    web_scraper._logs = deque(maxlen=100)
+    web_scraper.verbose = False
+    return web_scraper
+
+def test_fallback_text_with_xml_declaration(scraper):
+    html_content = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+        '<h1>Welcome</h1><p>Natural skincare</p>'
+        '</body></html>'
+    )
+
+    assert scraper._extract_fallback_text(scraper._parse_html(html_content)) == 'Welcome Natural skincare'
+
+def test_fallback_text_comment_only_page(scraper):
+    assert scraper._extract_fallback_text(scraper._parse_html('<!-- nothing rendered yet -->')) == ''
+
+def test_extract_links_onclick_handlers(scraper):
+    html_content = (
+        '<a href="/about">About</a>'
+        '<div onclick="window.location.href=\'/quoted\'">Quoted</div>'
+        "<button onclick=window.location.href='/unquoted'>Unquoted</button>"
+        '<!-- <div onclick="window.location.href=\'/commented\'">Old</div> -->'
+        '<script>var tpl = "<div onclick=\\"window.location.href=\'/scripted\'\\">";</script>'
+    )
+
+    links = scraper._extract_links(scraper._parse_html(html_content), 'https://example.com/', 'example.com')
+
+    assert set(links.values()) == {
+        'https://example.com/about',
+        'https://example.com/quoted',
+        'https://example.com/unquoted'
+    }
+
+@pytest.mark.parametrize("url", [
+    'https://example.com',
+    'https://example.com/',
+    'https://Example.COM/About',
+    'https://www.example.com/about',
+    'https://example.com:8080',
+    'https://example.com:8080/shop',
+    'https://example.com/docs/',
+    'https://example.com/a/b/c.html',
+    'https://example.com/page;jsessionid=abc',
+    'https://example.com/caf%C3%A9/a%20b',
+    'https://example.com/search?q=1#top',
+    'https://[::1]:8080/status',
+    'http://example.com/about',
+    'example.com/about',
+])
+def test_normalize_url_fast_path_matches_full_path(scraper, url):
+    assert scraper._normalize_url(url) == scraper._normalize_url_full(url)
+
+def test_extract_links_relative_to_directory_page(scraper):
+    page_url = scraper._normalize_url('https://Example.com/docs/')
+    html_content = (
+        '<a href="intro.html">Intro</a>'
+        '<a href="../docs">Docs</a>'
+        '<a href="/search?b=2&a=1">Search</a>'
+        '<a href="/search?a=1&b=2">Search again</a>'
+    )
+
+    links = scraper._extract_links(scraper._parse_html(html_content), page_url, 'example.com')
+
+    # The directory keeps its slash, so relative links stay inside it
+    assert page_url == 'https://example.com/docs/'
+    assert links['https://example.com/docs/intro.html'] == 'https://example.com/docs/intro.html'
+    # Variants of one page share a key but are fetched as linked
+    assert scraper._canonical_url(page_url) == 'https://example.com/docs'
+    assert links['https://example.com/docs'] == 'https://example.com/docs'
+    assert links['https://example.com/search?a=1&b=2'] == 'https://example.com/search?b=2&a=1'
+    assert len(links) == 3
@@ -1,10 +1,34 @@
 import streamlit as st
+import base64
 from screenshot_manager import ScreenshotManager
 from PIL import Image, ImageDraw
-import os
 
-# Initialize screenshot manager
-screenshot_manager = ScreenshotManager()
+# Initialize screenshot manager once per server rather than on every rerun
+@st.cache_resource
+def get_screenshot_manager() -> ScreenshotManager:
+    """Shared ScreenshotManager for all reruns and sessions"""
+    return ScreenshotManager()
+
+screenshot_manager = get_screenshot_manager()
+
+# Blank canvas shared by both sample images
+SAMPLE_CANVAS = Image.new('RGB', (400, 300), 'white')
+
+@st.cache_data(show_spinner=False)
+def build_sample_comparison() -> tuple:
+    """Draw and compare the fixed sample images once for all clicks and sessions"""
+    # Create sample images
+    img1 = SAMPLE_CANVAS.copy()
+    draw1 = ImageDraw.Draw(img1)
+    draw1.text((100, 150), "Original Content", fill="black")
+
+    img2 = SAMPLE_CANVAS.copy()
+    draw2 = ImageDraw.Draw(img2)
+    draw2.text((100, 150), "Updated Content", fill="blue")
+
+    # Compare the images directly, without a round trip through PNG files
+    # and build the diff mask once for both the images and the pixel counts
+    return screenshot_manager.compare_screenshot_images(img1, img2, with_stats=True)
 
 # Configure page with custom theme
 st.set_page_config(
@@ -40,48 +64,33 @@ st.markdown('<p class="big-text">Press the big red button below to see the demo!
 if st.button("▶️ CLICK HERE TO GENERATE SAMPLE COMPARISON", use_container_width=True):
     try:
         with st.spinner("Creating comparison..."):
-            # Create sample images
-            img1 = Image.new('RGB', (400, 300), 'white')
-            draw1 = ImageDraw.Draw(img1)
-            draw1.text((100, 150), "Original Content", fill="black")
-
-            img2 = Image.new('RGB', (400, 300), 'white')
-            draw2 = ImageDraw.Draw(img2)
-            draw2.text((100, 150), "Updated Content", fill="blue")
-
-            # Save temporary files
-            img1.save("temp_before.png")
-            img2.save("temp_after.png")
-
-            # Compare screenshots
-            before_img, after_img, diff_img = screenshot_manager.compare_screenshots(
-                "temp_before.png",
-                "temp_after.png"
-            )
-
-            # Display results in columns
+            # Keep the result for later reruns so it stays on screen
+            st.session_state.sample_comparison = build_sample_comparison()
             st.success("Comparison generated successfully!")
 
-            col1, col2, col3 = st.columns(3)
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
 
-            with col1:
-                st.markdown("### Before")
-                st.image(f"data:image/png;base64,{before_img}")
+if 'sample_comparison' in st.session_state:
+    before_img, after_img, diff_img, stats = st.session_state.sample_comparison
 
-            with col2:
-                st.markdown("### After")
-                st.image(f"data:image/png;base64,{after_img}")
+    st.metric("Changed Pixels", f"{stats['changed_pixels']:,}", f"{stats['changed_percent']:.2f}% of image", delta_color="off")
 
-            with col3:
-                st.markdown("### Differences")
-                st.image(f"data:image/png;base64,{diff_img}")
+    # Display results in columns; raw image bytes are served as media files
+    # instead of being inlined into the page as data URLs
+    col1, col2, col3 = st.columns(3)
 
-            # Cleanup temporary files
-            os.remove("temp_before.png")
-            os.remove("temp_after.png")
+    with col1:
+        st.markdown("### Before")
+        st.image(base64.b64decode(before_img))
 
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
+    with col2:
+        st.markdown("### After")
+        st.image(base64.b64decode(after_img))
+
+    with col3:
+        st.markdown("### Differences")
+        st.image(base64.b64decode(diff_img))
 else:
     # Show prominent message when button is not clicked
-    st.info("👆 Click the red button above to see how we detect changes between images!")
\ No newline at end of file
+    st.info("👆 Click the red button above to see how we detect changes between images!")
@@ -1,90 +1,104 @@
 import streamlit as st
+import base64
+import html
 import pandas as pd
-from datetime import datetime
+from bisect import bisect_right
 from typing import List, Dict, Any
 from diff_visualizer import DiffVisualizer
 from data_manager import DataManager  # Import the actual DataManager
 
+# Lower score bounds of the medium, high and critical buckets; a score's
+# bucket is its insertion point in this list
+SIGNIFICANCE_THRESHOLDS = [4, 6, 8]
+SIGNIFICANCE_LEVELS = ['low', 'medium', 'high', 'critical']
+
+# Changes shown per website before an "older changes" button; each diff
+# widget costs a full render, so long histories are revealed in pages
+TIMELINE_PAGE_SIZE = 20
+
 class TimelineVisualizer:
-    def __init__(self):
-        self.diff_visualizer = DiffVisualizer(key_prefix="timeline")
-        # Define color scheme for significance levels
-        self.significance_colors = {
-            'critical': '#FF4B4B',  # Red for high significance (8-10)
-            'high': '#FFA726',      # Orange for medium-high (6-7)
-            'medium': '#FDD835',    # Yellow for medium (4-5)
-            'low': '#66BB6A'        # Green for low (1-3)
-        }
-        # Add detailed explanations for significance levels
-        self.significance_explanations = {
-            'critical': """Critical changes (8-10):
+    # Emoji icon for each change type
+    CHANGE_ICONS = {
+        'text_change': '📝',
+        'links_added': '🔗',
+        'links_removed': '❌',
+        'visual_change': '🖼️',
+        'menu_structure_change': '📑',
+        'styles_added': '🎨',
+        'styles_removed': '🎨',
+        'fonts_added': '📰',
+        'fonts_removed': '📰',
+        'colors_added': '🎨',
+        'colors_removed': '🎨'
+    }
+
+    # Define color scheme for significance levels
+    significance_colors = {
+        'critical': '#FF4B4B',  # Red for high significance (8-10)
+        'high': '#FFA726',      # Orange for medium-high (6-7)
+        'medium': '#FDD835',    # Yellow for medium (4-5)
+        'low': '#66BB6A'        # Green for low (1-3)
+    }
+    # Add detailed explanations for significance levels
+    significance_explanations = {
+        'critical': """Critical changes (8-10):
             • Major impact on business operations
             • Immediate attention required
             • Potentially affects revenue or user experience
             • Examples: Pricing changes, Product removals, Major UI changes""",
-            'high': """High-impact changes (6-7):
+        'high': """High-impact changes (6-7):
             • Significant modifications to content or structure
             • Should be reviewed soon
             • May affect user navigation or content accessibility
             • Examples: Menu structure changes, New features, Content reorganization""",
-            'medium': """Medium-impact changes (4-5):
+        'medium': """Medium-impact changes (4-5):
             • Moderate modifications to content
             • Regular monitoring recommended
             • Minor impact on user experience
             • Examples: Text updates, Style changes, Image updates""",
-            'low': """Low-impact changes (1-3):
+        'low': """Low-impact changes (1-3):
             • Minor updates or refinements
             • Routine changes
             • Minimal impact on user experience
             • Examples: Typography updates, Small text changes, Minor style adjustments"""
+    }
+
+    def __init__(self):
+        self.diff_visualizer = DiffVisualizer(key_prefix="timeline")
+        # Card backgrounds only ever use these four colors at the default alpha
+        self._rgba_cache = {color: self._hex_to_rgba(color) for color in self.significance_colors.values()}
+
+        # Everything a change card needs from its significance level, built
+        # once so the render loop does a single lookup per change
+        self._level_styles = {
+            level: (
+                color,
+                self._rgba_cache[color],
+                level.title(),
+                html.escape(self.significance_explanations[level], quote=True)
+            )
+            for level, color in self.significance_colors.items()
         }
 
-    def _get_significance_color(self, score: int) -> str:
-        """Return color based on significance score"""
-        if score >= 8:
-            return self.significance_colors['critical']
-        elif score >= 6:
-            return self.significance_colors['high']
-        elif score >= 4:
-            return self.significance_colors['medium']
-        else:
-            return self.significance_colors['low']
-
-    def _get_significance_tooltip(self, score: int) -> str:
-        """Generate detailed tooltip text based on significance score"""
-        if score >= 8:
-            return self.significance_explanations['critical']
-        elif score >= 6:
-            return self.significance_explanations['high']
-        elif score >= 4:
-            return self.significance_explanations['medium']
-        else:
-            return self.significance_explanations['low']
+        # Legend is static, so build its HTML once: a single flex row with
+        # the explanation for each level as a hover tooltip
+        legend_cells = [
+            f'<div title="{self._level_styles[level][3]}" '
+            f'style="flex: 1; background-color: {color}; padding: 10px; border-radius: 5px; '
+            f'color: {"black" if level in ["medium", "low"] else "white"}; text-align: center;">'
+            f'{level.title()}</div>'
+            for level, color in self.significance_colors.items()
+        ]
+        self._legend_html = f'<div style="display: flex; gap: 1rem;">{"".join(legend_cells)}</div>'
+
+    def _get_significance_level(self, score: int) -> str:
+        """Return the significance level key for a score"""
+        return SIGNIFICANCE_LEVELS[bisect_right(SIGNIFICANCE_THRESHOLDS, score)]
 
     def _show_significance_legend(self):
         """Display a legend explaining significance colors with tooltips"""
         st.markdown("#### 📊 Change Significance Legend")
-        cols = st.columns(4)
-        for i, (level, color) in enumerate(self.significance_colors.items()):
-            with cols[i]:
-                st.markdown(
-                    f'<div style="background-color: {color}; padding: 10px; '
-                    f'border-radius: 5px; color: {"black" if level in ["medium", "low"] else "white"}; '
-                    f'text-align: center;">{level.title()}</div>',
-                    unsafe_allow_html=True,
-                    help=self.significance_explanations[level]  # Add tooltip to legend
-                )
-
-    def _get_significance_label(self, score: int) -> str:
-        """Return significance label based on score"""
-        if score >= 8:
-            return "Critical"
-        elif score >= 6:
-            return "High"
-        elif score >= 4:
-            return "Medium"
-        else:
-            return "Low"
+        st.markdown(self._legend_html, unsafe_allow_html=True)
 
     def _hex_to_rgba(self, hex_color: str, alpha: float = 0.1) -> str:
         """Convert hex color to rgba format"""
@@ -109,9 +123,17 @@ class TimelineVisualizer:
         data_manager = DataManager()
         monitored_websites = [config['url'] for config in data_manager.get_website_configs()]
 
+        # Build the cached frame once; parsing, filtering and grouping then
+        # run as vectorized pandas operations instead of per-change loops
+        df = self._prepare_timeline_data(changes)
+        self._render_timeline_view(df, monitored_websites)
+
+    # Runs as a fragment so filter and diff widgets rerun only the listing
+    @st.fragment
+    def _render_timeline_view(self, df: pd.DataFrame, monitored_websites: List[str]):
+        """Render the filtered, per-website timeline of change cards"""
         # Combine with websites from changes
-        change_websites = list(set(change.get('url', 'Unknown') for change in changes))
-        all_websites = sorted(list(set(monitored_websites + change_websites)))
+        all_websites = sorted(set(monitored_websites).union(df['url'].cat.categories))
 
         # Add filters at the top
         col1, col2, col3 = st.columns([2, 1, 1])
@@ -123,15 +145,8 @@ class TimelineVisualizer:
                 key="timeline_website_filter"
             )
 
-        # Convert timestamps to datetime objects for filtering
-        for change in changes:
-            if isinstance(change['timestamp'], str):
-                change['timestamp'] = datetime.fromisoformat(change['timestamp'].replace('Z', '+00:00'))
-
         # Get date range for the changes
-        all_dates = [change['timestamp'] for change in changes]
-        min_date = min(all_dates).date() if all_dates else datetime.now().date()
-        max_date = max(all_dates).date() if all_dates else datetime.now().date()
+        min_date, max_date = (day.date() for day in df['date'].agg(['min', 'max']))
 
         with col2:
             start_date = st.date_input(
@@ -151,118 +166,126 @@ class TimelineVisualizer:
                 key="timeline_end_date"
             )
 
-        # Filter changes based on selection
-        filtered_changes = changes
+        # The frame is in time order, so the date range is a slice found by
+        # binary search; only the website filter needs a mask
+        lo = df['date'].searchsorted(pd.Timestamp(start_date), side='left')
+        hi = df['date'].searchsorted(pd.Timestamp(end_date), side='right')
+        filtered = df.iloc[lo:hi]
         if selected_website != "All Websites":
-            filtered_changes = [c for c in filtered_changes if c.get('url') == selected_website]
+            filtered = filtered[filtered['url'] == selected_website]
 
-        # Filter by date range
-        filtered_changes = [
-            c for c in filtered_changes
-            if start_date <= c['timestamp'].date() <= end_date
-        ]
-
-        if not filtered_changes:
+        if filtered.empty:
             if selected_website != "All Websites":
                 st.info(f"No changes found for {selected_website} in the selected date range.")
             else:
                 st.info("No changes found for the selected date range.")
             return
 
-        # Group changes by URL
-        changes_by_url = {}
-        for change in filtered_changes:
-            url = change.get('url', 'Unknown')
-            if url not in changes_by_url:
-                changes_by_url[url] = []
-            changes_by_url[url].append(change)
+        # Sort by URL, newest first within each URL, so groupby yields each
+        # URL's changes as one newest-first run
+        filtered = filtered.sort_values(['url', 'timestamp'], ascending=[True, False], kind='stable')
+
+        # Number of changes revealed so far for each website
+        if 'timeline_visible_changes' not in st.session_state:
+            st.session_state.timeline_visible_changes = {}
+        visible_changes = st.session_state.timeline_visible_changes
 
         # Display changes for each URL
-        for url_idx, (url, url_changes) in enumerate(changes_by_url.items()):
-            st.markdown(f"### 🌐 {url}")
+        for url_idx, (url, url_changes) in enumerate(filtered.groupby('url', sort=False, observed=True)):
+            visible = visible_changes.get(url, TIMELINE_PAGE_SIZE)
+            hidden = len(url_changes) - visible
+            url_changes = url_changes.iloc[:visible]
+            sorted_changes = zip(url_changes['change_data'], url_changes['ts_label'], url_changes['type_title'])
+
+            # The URL heading, card and analysis HTML are batched into one
+            # st.markdown call per run of changes; only the diff widgets need
+            # their own elements
+            parts = [f"### 🌐 {url}\n\n"]
+            for change_idx, (change, ts_label, type_title) in enumerate(sorted_changes):
+                score = change.get('significance_score', 5)
+                color, bg_color, label, tooltip = self._level_styles[self._get_significance_level(score)]
+
+                # Change card; the significance explanation shows on hover
+                parts.append(
+                    f'<div title="{tooltip}" style="border-left: 5px solid {color}; padding: 10px; margin: 10px 0; '
+                    f'background-color: {bg_color};">'
+                    f'<h4>{type_title}</h4>'
+                    f'<p><strong>Time:</strong> {ts_label}</p>'
+                    f'<p><strong>Location:</strong> {change["location"]}</p>'
+                    f'<p><strong>Significance:</strong> {score} ({label})</p>'
+                    f'</div>'
+                )
 
-            # Sort changes by timestamp in reverse order
-            sorted_changes = sorted(url_changes, key=lambda x: x['timestamp'], reverse=True)
+                # Show analysis as a two-column table
+                if 'analysis' in change:
+                    analysis = change['analysis']
+                    parts.append(
+                        '<table style="width: 100%;"><tr>'
+                        '<th title="Detailed analysis of the change\'s impact on the website">Impact Analysis</th>'
+                        '<th title="Suggested actions based on the change analysis">Recommendations</th>'
+                        '</tr><tr>'
+                        f'<td><ul><li>Category: {html.escape(str(analysis.get("impact_category", "Unknown")))}</li>'
+                        f'<li>Business Relevance: {html.escape(str(analysis.get("business_relevance", "Unknown")))}</li></ul></td>'
+                        f'<td><ul><li>{html.escape(str(analysis.get("recommendations", "No recommendations available")))}</li>'
+                        f'<li>{html.escape(str(analysis.get("explanation", "No explanation available")))}</li></ul></td>'
+                        '</tr></table>'
+                    )
 
-            for change_idx, change in enumerate(sorted_changes):
-                score = change.get('significance_score', 5)
-                color = self._get_significance_color(score)
-                bg_color = self._hex_to_rgba(color)
-                tooltip = self._get_significance_tooltip(score)
-
-                # Create container for the change card with tooltip
-                with st.container():
-                    # Add help tooltip to the entire change card
-                    st.markdown(
-                        f'<div style="border-left: 5px solid {color}; padding: 10px; margin: 10px 0; '
-                        f'background-color: {bg_color};">'
-                        f'<h4>{change["type"].replace("_", " ").title()}</h4>'
-                        f'<p><strong>Time:</strong> {change["timestamp"]}</p>'
-                        f'<p><strong>Location:</strong> {change["location"]}</p>'
-                        f'<p><strong>Significance:</strong> {score} ({self._get_significance_label(score)})</p>'
-                        f'</div>',
-                        unsafe_allow_html=True,
-                        help=tooltip
+                # Show content changes
+                if 'before' in change and 'after' in change:
+                    parts.append('<p title="View the specific content that was changed"><strong>Content Changes</strong></p>')
+                    st.markdown(''.join(parts), unsafe_allow_html=True)
+                    parts = []
+                    self.diff_visualizer.visualize_diff(
+                        change['before'],
+                        change['after'],
+                        key_prefix=f"timeline_diff_{url_idx}_{change_idx}"
                     )
 
-                    # Show analysis in columns with tooltips
-                    if 'analysis' in change:
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown("**Impact Analysis**",
-                                      help="Detailed analysis of the change's impact on the website")
-                            st.write(f"- Category: {change['analysis'].get('impact_category', 'Unknown')}")
-                            st.write(f"- Business Relevance: {change['analysis'].get('business_relevance', 'Unknown')}")
-                        with col2:
-                            st.markdown("**Recommendations**",
-                                      help="Suggested actions based on the change analysis")
-                            st.write(f"- {change['analysis'].get('recommendations', 'No recommendations available')}")
-                            st.write(f"- {change['analysis'].get('explanation', 'No explanation available')}")
-
-                    # Show content changes
-                    if 'before' in change and 'after' in change:
-                        st.markdown("**Content Changes**",
-                                  help="View the specific content that was changed")
-                        diff_viz = DiffVisualizer(key_prefix=f"timeline_diff_{url_idx}_{change_idx}")
-                        diff_viz.visualize_diff(
-                            change['before'],
-                            change['after']
-                        )
+                parts.append('<hr>')  # Add separator between changes
 
-                st.markdown("---")  # Add separator between changes
+            if parts:
+                st.markdown(''.join(parts), unsafe_allow_html=True)
+
+            if hidden > 0:
+                st.button(
+                    f"Show {min(hidden, TIMELINE_PAGE_SIZE)} older changes",
+                    key=f"timeline_more_{url_idx}",
+                    on_click=self._show_more_changes,
+                    args=(url, visible)
+                )
+
+    def _show_more_changes(self, url: str, visible: int):
+        """Reveal the next page of changes for a website"""
+        st.session_state.timeline_visible_changes[url] = visible + TIMELINE_PAGE_SIZE
 
     def _get_change_icon(self, change_type: str) -> str:
         """Return an emoji icon based on change type"""
-        icons = {
-            'text_change': '📝',
-            'links_added': '🔗',
-            'links_removed': '❌',
-            'visual_change': '🖼️',
-            'menu_structure_change': '📑',
-            'styles_added': '🎨',
-            'styles_removed': '🎨',
-            'fonts_added': '📰',
-            'fonts_removed': '📰',
-            'colors_added': '🎨',
-            'colors_removed': '🎨'
-        }
-        return icons.get(change_type, '📄')
+        return self.CHANGE_ICONS.get(change_type, '📄')
 
     def _prepare_timeline_data(self, changes: List[Dict[str, Any]]) -> pd.DataFrame:
         """Convert changes data to a DataFrame for timeline visualization"""
-        timeline_data = []
-        for change in changes:
-            timeline_data.append({
-                'timestamp': datetime.fromisoformat(change['timestamp']),
-                'type': change['type'],
-                'location': change['location'],
-                'url': change.get('url', 'Unknown'),
-                'page_name': change.get('location', '').split('/')[-1] or 'Homepage',
-                'significance': change.get('significance_score', 0),
-                'change_data': change
-            })
-        return pd.DataFrame(timeline_data)
-
+        # Key the cache on the few fields the frame is built from; hashing
+        # the full change dicts (with before/after text) would cost more
+        # than building the frame
+        rows = tuple(
+            (
+                change['timestamp'],
+                change['type'],
+                change['location'],
+                change.get('url', 'Unknown'),
+                change.get('significance_score', 0)
+            )
+            for change in changes
+        )
+        df = _build_timeline_frame(rows)
+        if not df.empty:
+            # Align by index, since the frame is sorted by time
+            df['change_data'] = pd.Series(changes, dtype=object)
+        return df
+
+    # Runs as a fragment so its widgets rerun only this view
+    @st.fragment
     def _render_comparison_view(self, df: pd.DataFrame):
         """Render the comparison view tab"""
         st.markdown("### Compare Changes Across Time")
@@ -270,70 +293,79 @@ class TimelineVisualizer:
         # Filter options for comparison
         url_to_compare = st.selectbox(
             "Select Website to Compare",
-            options=list(df['url'].unique()),
+            options=df['url'].cat.categories.tolist(),
             key="timeline_compare_url"
         )
 
         # Filter changes for selected URL
         url_changes = df[df['url'] == url_to_compare]
 
+        # Options are the preformatted labels, so no per-option strftime;
+        # index each label's first change once so selections are dict lookups
+        label_to_change = {}
+        for label, timestamp, change in zip(url_changes['ts_label'], url_changes['timestamp'], url_changes['change_data']):
+            label_to_change.setdefault(label, (timestamp, change))
+        # Unique labels in time order; the fixed-width format also sorts
+        # lexically in time order
+        labels = list(label_to_change)
+
         # Create two columns for selecting timestamps
         col1, col2 = st.columns(2)
         with col1:
-            timestamp1 = st.selectbox(
+            label1 = st.selectbox(
                 "Select First Timestamp",
-                options=url_changes['timestamp'],
-                format_func=lambda x: x.strftime('%Y-%m-%d %H:%M:%S'),
+                options=labels,
                 key="timeline_timestamp1"
             )
 
-        if timestamp1:
+        if label1:
+            timestamp1, change1 = label_to_change[label1]
             with col2:
-                # Only show timestamps after the first selected timestamp
-                later_timestamps = url_changes[url_changes['timestamp'] > timestamp1]['timestamp']
-                timestamp2 = st.selectbox(
+                # Only show timestamps after the first selected timestamp;
+                # labels are sorted, so they are the tail past label1
+                label2 = st.selectbox(
                     "Select Second Timestamp",
-                    options=later_timestamps,
-                    format_func=lambda x: x.strftime('%Y-%m-%d %H:%M:%S'),
+                    options=labels[bisect_right(labels, label1):],
                     key="timeline_timestamp2"
                 )
 
-                if timestamp2:
-                    # Get the change data for both timestamps
-                    change1 = url_changes[url_changes['timestamp'] == timestamp1].iloc[0]['change_data']
-                    change2 = url_changes[url_changes['timestamp'] == timestamp2].iloc[0]['change_data']
+                if label2:
+                    timestamp2, change2 = label_to_change[label2]
 
                     st.markdown("### Comparison Results")
 
-                    # Create a unique diff visualizer for the comparison
-                    comparison_diff = DiffVisualizer(
-                        key_prefix=f"comparison_{timestamp1.strftime('%Y%m%d%H%M%S')}_{timestamp2.strftime('%Y%m%d%H%M%S')}"
+                    # Unique widget key prefix for the comparison diff
+                    comparison_key = (
+                        f"comparison_{timestamp1.strftime('%Y%m%d%H%M%S')}_{timestamp2.strftime('%Y%m%d%H%M%S')}"
                     )
 
                     # Display comparison based on change type
                     if change1['type'] == 'visual_change' and change2['type'] == 'visual_change':
                         cols = st.columns(2)
                         with cols[0]:
-                            st.write(f"State at {timestamp1.strftime('%Y-%m-%d %H:%M:%S')}")
-                            st.image(f"data:image/png;base64,{change1['after_image']}")
+                            st.write(f"State at {label1}")
+                            st.image(base64.b64decode(change1['after_image']))
                         with cols[1]:
-                            st.write(f"State at {timestamp2.strftime('%Y-%m-%d %H:%M:%S')}")
-                            st.image(f"data:image/png;base64,{change2['after_image']}")
+                            st.write(f"State at {label2}")
+                            st.image(base64.b64decode(change2['after_image']))
                     else:
                         st.write("Content Changes Between Selected Times:")
-                        comparison_diff.visualize_diff(
+                        self.diff_visualizer.visualize_diff(
                             change1.get('after', ''),
-                            change2.get('after', '')
+                            change2.get('after', ''),
+                            key_prefix=comparison_key
                         )
 
+    # Runs as a fragment so its widgets rerun only this view
+    @st.fragment
     def _render_analytics_view(self, df: pd.DataFrame):
         """Render the analytics view tab"""
         st.markdown("### Change Analytics")
 
         # Time-based analysis
         st.markdown("#### Change Frequency Over Time")
-        df['date'] = df['timestamp'].dt.date
-        daily_changes = df.groupby('date').size()
+        # The frame is kept in time order, so groups already come out by date
+        daily_changes = df.groupby('date', sort=False).size()
         st.line_chart(daily_changes)
 
         # Change type distribution
@@ -343,11 +375,37 @@ class TimelineVisualizer:
 
         # Significance distribution
         st.markdown("#### Significance Score Distribution")
-        significance_dist = df['significance'].value_counts().sort_index()
+        significance_dist = df['significance'].value_counts(sort=False).sort_index()
         st.bar_chart(significance_dist)
 
         # Website activity
         if 'url' in df.columns:
             st.markdown("#### Website Activity")
             website_activity = df['url'].value_counts()
-            st.bar_chart(website_activity)
\ No newline at end of file
+            st.bar_chart(website_activity)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _build_timeline_frame(rows: tuple) -> pd.DataFrame:
+    """Build the timeline DataFrame from (timestamp, type, location, url, score) rows"""
+    df = pd.DataFrame.from_records(
+        rows, columns=['timestamp', 'type', 'location', 'url', 'significance']
+    )
+    # Parse all timestamps in one vectorized call; stored changes mix naive
+    # and UTC-offset ISO strings, so normalise everything to UTC
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', utc=True, cache=True)
+    # Keep the frame in time order so date ranges can be cut with
+    # searchsorted; the index still holds each row's position in rows
+    df = df.sort_values('timestamp', kind='stable')
+    df['url'] = df['url'].fillna('Unknown')
+    df['significance'] = pd.to_numeric(df['significance']).fillna(0)
+    # Midnight datetime64 rather than Python date objects, so grouping and
+    # range filters on dates stay in NumPy
+    df['date'] = df['timestamp'].dt.tz_localize(None).dt.normalize()
+    df['ts_label'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    # Few distinct values repeat across many changes, so store them as
+    # categories; value_counts then works on integer codes
+    for column in ('type', 'url'):
+        df[column] = df[column].astype('category')
+    # Card headings, formatted once per distinct type rather than per change
+    df['type_title'] = df['type'].map(lambda change_type: change_type.replace('_', ' ').title(), na_action='ignore')
+    return df